@@ -0,0 +1,48 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Print the slowest imports of a command, e.g.
+
+python tests/unittest/import_time.py -m uploader.services get-version -n ...
+"""
+
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def import_times(args: List[str]) -> Dict[str, int]:
+    """Return the self import time of each module loaded by a command, excluding site."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        if name == " site":
+            # modules loaded at interpreter startup are not ours to trim
+            times = {}
+            continue
+        times[name.strip()] = int(self_us)
+    return times
+
+
+def main():
+    """Print the 20 slowest imports of the command given as arguments."""
+    for name, self_us in sorted(
+        import_times(sys.argv[1:]).items(), key=lambda x: x[1], reverse=True
+    )[:20]:
+        print(f"{self_us:>10} us  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+
+import io
+import tarfile
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import pytest
+
+from uploader.utils import upload_jars
+
+
+class FakeArtifactory(ThreadingHTTPServer):
+    """Local Artifactory accepting single file and explode-archive deploys."""
+
+    def __init__(self, explode: bool):
+        super().__init__(("127.0.0.1", 0), FakeArtifactoryHandler)
+        self.explode = explode
+        self.requests: List[str] = []
+        self.files: Dict[str, bytes] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/libs-release/"
+
+
+class FakeArtifactoryHandler(BaseHTTPRequestHandler):
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        path = self.path[len("/libs-release/") :]
+        self.server.requests.append(path)
+        if self.headers.get("X-Explode-Archive-Atomic") == "true":
+            if not self.server.explode:
+                self.send_response(405)
+                self.end_headers()
+                return
+            with zipfile.ZipFile(io.BytesIO(body)) as archive:
+                for name in archive.namelist():
+                    self.server.files[name] = archive.read(name)
+        else:
+            self.server.files[path] = body
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def release_files(tmp_path):
+    tarball_path = tmp_path / "spark-3.4.1-bin-ubuntu0-20230821132449.tgz"
+    with tarfile.open(tarball_path, "w:gz") as tarball:
+        content = b"jar"
+        info = tarfile.TarInfo("spark/jars/foo-1.0.jar")
+        info.size = len(content)
+        tarball.addfile(info, io.BytesIO(content))
+
+    repository_path = tmp_path / "repository.zip"
+    with zipfile.ZipFile(repository_path, "w") as repository:
+        repository.writestr("repository/org/foo/1.0/foo-1.0.jar", b"jar")
+        repository.writestr("repository/org/foo/1.0/foo-1.0.pom", b"pom")
+        repository.writestr("repository/org/foo/1.0/foo-1.0.jar.sha1", b"sha1")
+        repository.writestr("repository/org/foo/1.0/_remote.repositories", b"")
+        repository.writestr("repository/org/bar/2.0/bar-2.0.jar", b"jar")
+
+    return str(tarball_path), str(repository_path)
+
+
+EXPECTED_FILES = {
+    "org/foo/1.0/foo-1.0.jar": b"jar",
+    "org/foo/1.0/foo-1.0.pom": b"pom",
+    "org/foo/1.0/foo-1.0.jar.sha1": b"sha1",
+}
+
+
+@pytest.mark.parametrize(
+    "bulk,explode,expected_requests",
+    [(False, True, 3), (True, True, 1), (True, False, 4)],
+)
+def test_upload_jars(release_files, bulk, explode, expected_requests):
+    """This function test the deploy of jars to a local fake Artifactory."""
+    server = FakeArtifactory(explode)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        upload_jars(*release_files, server.url, "user", "password", bulk)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert server.files == EXPECTED_FILES
+    assert len(server.requests) == expected_requests
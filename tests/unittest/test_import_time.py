@@ -0,0 +1,57 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+
+from typing import Dict, List
+
+import pytest
+from import_time import import_times
+
+NETWORK_MODULES = ["requests", "urllib3", "httplib2", "launchpadlib", "lazr"]
+ARCHIVE_MODULES = ["tarfile", "zipfile", "shutil"]
+
+# the import time of the entry points is compared to the one of the standard
+# modules every entry point needs, measured on the same machine
+BASELINE_MODULES = "argparse, json, logging"
+SERVICES_FACTOR = 2.5
+LAUNCHPAD_SCRIPTS_FACTOR = 4
+
+
+@pytest.fixture(scope="module")
+def baseline_us() -> int:
+    return sum(import_times(["-c", f"import {BASELINE_MODULES}"]).values())
+
+
+def assert_not_imported(times: Dict[str, int], prefixes: List[str]):
+    imported = [
+        name
+        for name in times
+        if any(name == p or name.startswith(f"{p}.") for p in prefixes)
+    ]
+    assert not imported, f"Unexpected imports: {imported}"
+
+
+@pytest.mark.parametrize(
+    "action",
+    [
+        ["get-version", "-n", "spark-3.4.1-bin-ubuntu0-20230821132449.tgz"],
+        ["validate-name", "-n", "spark-3.4.1-bin-ubuntu0-20230821132449.tgz"],
+    ],
+)
+def test_services_cheap_actions_import_time(action, baseline_us):
+    """This function test that the validation actions only load what they need."""
+    times = import_times(["-m", "uploader.services", *action])
+
+    assert_not_imported(times, NETWORK_MODULES + ARCHIVE_MODULES + ["uploader.utils"])
+    assert sum(times.values()) < SERVICES_FACTOR * baseline_us
+
+
+@pytest.mark.parametrize(
+    "module", ["uploader.launchpad_downloader", "uploader.launchpad_release"]
+)
+def test_launchpad_scripts_import_time(module, baseline_us):
+    """This function test that the Launchpad client is only loaded when used."""
+    times = import_times(["-c", f"import {module}"])
+
+    assert_not_imported(times, NETWORK_MODULES + ["urllib.request"])
+    assert sum(times.values()) < LAUNCHPAD_SCRIPTS_FACTOR * baseline_us
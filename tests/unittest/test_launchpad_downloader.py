@@ -0,0 +1,210 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from uploader.launchpad_downloader import (
+    get_latest_build,
+    iter_latest_builds,
+    prefetch,
+    read_watch_state,
+    watch,
+)
+
+
+def _report(buildstate: str, day: int) -> MagicMock:
+    report = MagicMock()
+    report.ci_build.buildstate = buildstate
+    report.ci_build.datebuilt = datetime(2023, 8, day)
+    report.ci_build.commit_sha1 = f"sha-{day}"
+    report.ci_build.getFileUrls.return_value = [f"https://lp/spark-{day}.tgz"]
+    return report
+
+
+def test_get_latest_build():
+    """This function test the selection of the latest successful build."""
+    reports = [
+        _report("Successfully built", 1),
+        _report("Failed to build", 3),
+        _report("Successfully built", 2),
+    ]
+    repo = MagicMock()
+    repo.getStatusReports.return_value = reports
+    branch = MagicMock(path="refs/heads/lp-spark-3.4.1", commit_sha1="sha")
+
+    build_run = get_latest_build(repo, branch)
+
+    assert build_run.commit_sha1 == "sha-2"
+    assert build_run.artifact_urls == ["https://lp/spark-2.tgz"]
+    reports[0].ci_build.getFileUrls.assert_not_called()
+
+    repo.getStatusReports.return_value = reports[1:2]
+    assert get_latest_build(repo, branch) is None
+
+
+def test_iter_latest_builds():
+    """This function test that branches without successful builds are reported."""
+    repo = MagicMock()
+    repo.branches = [
+        MagicMock(path="refs/heads/lp-spark-3.4.1", commit_sha1="a"),
+        MagicMock(path="refs/heads/main", commit_sha1="b"),
+    ]
+    repo.getStatusReports.return_value = [_report("Failed to build", 1)]
+    lp = MagicMock()
+    lp.git_repositories.getByPath.return_value = repo
+
+    assert list(iter_latest_builds(lp, "repo", "lp-spark-3.4")) == [
+        ("refs/heads/lp-spark-3.4.1", None)
+    ]
+
+
+def test_prefetch():
+    """This function test the background iteration of items."""
+    assert list(prefetch(iter(range(10)), maxsize=2)) == list(range(10))
+
+    def failing():
+        yield 1
+        raise RuntimeError("discovery failed")
+
+    items = prefetch(failing())
+    assert next(items) == 1
+    with pytest.raises(RuntimeError):
+        next(items)
+
+    # an unbounded buffer is rejected
+    with pytest.raises(ValueError):
+        next(prefetch(iter(range(10)), maxsize=0))
+
+
+class FakeRepository:
+    """Local Launchpad git repository with branches and their CI builds."""
+
+    def __init__(self):
+        self.branches = []
+        self.builds = {}
+        self.status_report_calls = 0
+        self.failures = 0
+
+    def push(self, path: str, commit_sha1: str, buildstate: str, day: int):
+        self.branches = [b for b in self.branches if b.path != path]
+        self.branches.append(SimpleNamespace(path=path, commit_sha1=commit_sha1))
+        self.builds[commit_sha1] = SimpleNamespace(
+            buildstate=buildstate,
+            datebuilt=datetime(2023, 8, day),
+            commit_sha1=commit_sha1,
+            build_log_url="",
+            results={},
+            getFileUrls=lambda: [f"https://lp/spark-{commit_sha1}.tgz"],
+        )
+
+    def getStatusReports(self, commit_sha1: str):
+        self.status_report_calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Launchpad is unavailable")
+        return [SimpleNamespace(ci_build=self.builds[commit_sha1])]
+
+
+def test_watch(tmp_path):
+    """This function test that watch mode only processes new builds."""
+    repo = FakeRepository()
+    lp = SimpleNamespace(git_repositories=SimpleNamespace(getByPath=lambda path: repo))
+    repo.push("refs/heads/lp-spark-3.4.1", "a", "Successfully built", 1)
+    repo.push("refs/heads/lp-spark-3.4.2", "b", "Currently building", 1)
+    repo.push("refs/heads/lp-spark-3.4.3", "c", "Failed to build", 1)
+
+    downloads = []
+    candidates = []
+    intervals = []
+    clock = [0.0]
+
+    def sleep(interval):
+        intervals.append(interval)
+        clock[0] += interval
+        if len(intervals) == 2:
+            repo.push("refs/heads/lp-spark-3.4.2", "b", "Successfully built", 2)
+            # the failed build is retried on the same commit
+            repo.push("refs/heads/lp-spark-3.4.3", "c", "Successfully built", 3)
+
+    state_file = str(tmp_path / "state.json")
+    watch(
+        lp,
+        "repo",
+        "lp-spark-3.4",
+        downloads.append,
+        candidates.append,
+        state_file,
+        min_interval=1,
+        max_interval=4,
+        max_polls=5,
+        sleep=sleep,
+        clock=lambda: clock[0],
+    )
+
+    # the retried build is found once max_interval has passed since the failure
+    assert [build.commit_sha1 for build in downloads] == ["a", "b", "c"]
+    assert [c["branch"] for c in candidates] == [
+        "refs/heads/lp-spark-3.4.1",
+        "refs/heads/lp-spark-3.4.2",
+        "refs/heads/lp-spark-3.4.3",
+    ]
+    assert intervals == [1, 2, 1, 1]
+    state = read_watch_state(state_file)
+    assert {branch: s["status"] for branch, s in state.items()} == {
+        "refs/heads/lp-spark-3.4.1": "built",
+        "refs/heads/lp-spark-3.4.2": "built",
+        "refs/heads/lp-spark-3.4.3": "built",
+    }
+    # processed heads are never checked again, pending ones on every poll and
+    # failed ones every max_interval
+    assert repo.status_report_calls == 6
+
+    # a new run resumes from the stored state
+    watch(lp, "repo", "", downloads.append, candidates.append, state_file, max_polls=1)
+    assert len(downloads) == 3
+
+
+def test_watch_failed_poll(tmp_path):
+    """This function test that watch mode keeps polling after a failed poll."""
+    repo = FakeRepository()
+    lp = SimpleNamespace(git_repositories=SimpleNamespace(getByPath=lambda path: repo))
+    repo.push("refs/heads/lp-spark-3.4.1", "a", "Successfully built", 1)
+    repo.failures = 1
+
+    downloads = []
+    intervals = []
+    state_file = str(tmp_path / "state.json")
+    watch(
+        lp,
+        "repo",
+        "lp-spark-3.4",
+        downloads.append,
+        lambda candidate: None,
+        state_file,
+        min_interval=1,
+        max_interval=4,
+        max_polls=3,
+        sleep=intervals.append,
+        clock=lambda: 0.0,
+    )
+
+    # the failed poll backs off to max_interval and the next one recovers
+    assert [build.commit_sha1 for build in downloads] == ["a"]
+    assert intervals == [4, 1]
+    assert (
+        read_watch_state(state_file)["refs/heads/lp-spark-3.4.1"]["status"] == "built"
+    )
+
+    # a bounded run still reports the error of its last poll
+    repo.push("refs/heads/lp-spark-3.4.1", "b", "Successfully built", 2)
+    repo.failures = 1
+    with pytest.raises(ConnectionError):
+        watch(lp, "repo", "", downloads.append, lambda c: None, state_file, max_polls=1)
+    assert (
+        read_watch_state(state_file)["refs/heads/lp-spark-3.4.1"]["commit_sha1"] == "a"
+    )
@@ -0,0 +1,63 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+
+from unittest.mock import MagicMock, patch
+
+from uploader.launchpad_release import ProjectReleases, ReleaseEntry, release_entries
+
+
+def test_project_releases_fetched_once():
+    """This function test that series, milestones and releases are fetched once."""
+    lp_series = MagicMock()
+    lp_series.all_milestones = [MagicMock()]
+    lp_series.all_milestones[0].name = "3.4.1"
+    lp_series.releases = [MagicMock(version="3.4.1")]
+    lp_project = MagicMock()
+    lp_project.getSeries.return_value = lp_series
+
+    project_releases = ProjectReleases(lp_project, "spark")
+    for version in ["3.4.1", "3.4.2", "3.4.2"]:
+        project_releases.get_release(ReleaseEntry("3.4", version, "spark.tgz"))
+
+    lp_project.getSeries.assert_called_once_with(name="3.4")
+    lp_series.newMilestone.assert_called_once_with(name="3.4.2")
+    assert lp_series.newMilestone.return_value.createProductRelease.call_count == 1
+    assert lp_project.getRelease.call_count == 2
+
+
+def test_release_entries_sequential(tmp_path):
+    """This function test the upload of the files of all the entries."""
+    entries = []
+    for version in ["3.4.1", "3.4.2"]:
+        tarball = tmp_path / f"spark-{version}.tgz"
+        tarball.write_bytes(b"tarball")
+        entries.append(ReleaseEntry("3.4", version, str(tarball)))
+    lp_project = MagicMock()
+    lp_project.getSeries.return_value.all_milestones = []
+    lp_project.getSeries.return_value.releases = []
+
+    release_entries(lp_project, "spark", entries, "spark-releases", "creds", 1)
+
+    release = lp_project.getSeries.return_value.newMilestone.return_value
+    release = release.createProductRelease.return_value
+    assert release.add_file.call_count == 2
+
+
+def test_release_entries_concurrent(tmp_path):
+    """This function test the concurrent upload with a client per worker."""
+    entries = []
+    for version in ["3.4.1", "3.4.2", "3.4.3"]:
+        tarball = tmp_path / f"spark-{version}.tgz"
+        tarball.write_bytes(b"tarball")
+        entries.append(ReleaseEntry("3.4", version, str(tarball)))
+    lp_project = MagicMock()
+    lp_project.getSeries.return_value.all_milestones = []
+    lp_project.getSeries.return_value.releases = []
+
+    with patch("uploader.launchpad_release.get_launchpad") as get_launchpad:
+        release_entries(lp_project, "spark", entries, "spark-releases", "creds", 2)
+
+    assert 1 <= get_launchpad.call_count <= 2
+    release = get_launchpad.return_value.load.return_value
+    assert release.add_file.call_count == 3
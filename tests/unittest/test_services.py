@@ -0,0 +1,75 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+
+import io
+import json
+import os
+from unittest.mock import patch
+
+from uploader.services import serve
+from uploader.utils import clear_tags_cache
+
+
+def test_serve(capsys):
+    """This function test the processing of JSON-lines requests."""
+    requests = [
+        {
+            "id": 1,
+            "action": "get-version",
+            "name": "spark-3.4.1-bin-ubuntu0-20230821132449.tgz",
+        },
+        {"id": 2, "action": "validate-name", "name": "spark-3.4-bin-ubuntu0.tgz"},
+        {"id": 3, "action": "serve"},
+        {"id": 4, "action": "upload-product-jars", "tarball_path": "spark.tgz"},
+        {"id": 5, "action": "validate-name", "name": "x", "help": True},
+    ]
+    input_stream = io.StringIO(
+        "\n".join(json.dumps(r) for r in requests) + "\n\nnot-json\n"
+    )
+    output_stream = io.StringIO()
+
+    serve(input_stream, output_stream)
+
+    responses = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+    assert len(responses) == 6
+    assert responses[0] == {
+        "id": 1,
+        "status": "ok",
+        "result": "spark-3.4.1-bin-ubuntu0",
+    }
+    assert responses[1]["id"] == 2
+    assert responses[1]["status"] == "error"
+    assert responses[2]["status"] == "error"
+    assert responses[3]["id"] == 4
+    assert responses[3]["error"].startswith("ValueError: Invalid request arguments")
+    assert responses[4]["id"] == 5
+    assert responses[4]["status"] == "error"
+    assert responses[5]["status"] == "error"
+    # argparse output never reaches stdout
+    assert capsys.readouterr().out == ""
+
+
+def test_serve_reuses_tags(tmp_path):
+    """This function test that tags are shared by the requests of a worker."""
+    release_directory = tmp_path / "output" / "lp-spark-3.4.1"
+    os.makedirs(release_directory)
+    (release_directory / "spark-3.4.1-bin-ubuntu0-20230821132449.tgz").touch()
+    request = {
+        "action": "check-releases",
+        "output_directory": str(tmp_path / "output"),
+        "tarball_pattern": "spark-*.tgz",
+        "repository_owner": "test-owner",
+        "project_name": "test-project",
+    }
+    input_stream = io.StringIO(json.dumps(request) + "\n" + json.dumps(request))
+    output_stream = io.StringIO()
+
+    clear_tags_cache()
+    with patch("uploader.utils._fetch_repositories_tags", return_value=()) as fetch:
+        serve(input_stream, output_stream)
+    clear_tags_cache()
+
+    responses = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+    assert [r["status"] for r in responses] == ["ok", "ok"]
+    assert fetch.call_count == 1
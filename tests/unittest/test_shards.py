@@ -0,0 +1,84 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+
+import os
+
+import pytest
+
+from uploader.shards import (
+    get_shard,
+    is_in_shard,
+    merge,
+    read_manifest,
+    write_manifest,
+)
+
+
+def test_shards_partition_branches():
+    """This function test that every branch belongs to exactly one shard."""
+    branches = [f"refs/heads/lp-spark-3.4.{i}" for i in range(50)]
+
+    for branch in branches:
+        assert get_shard(branch, 4) == get_shard(branch, 4)
+        assert sum(is_in_shard(branch, index, 4) for index in range(4)) == 1
+        assert is_in_shard(branch, 0, 1)
+
+
+def test_merge(tmp_path):
+    """This function test the merge of the output of the shards."""
+    for index, branch in enumerate(["lp-spark-3.4.1", "lp-spark-3.4.2"]):
+        os.makedirs(tmp_path / f"shard-{index}" / branch)
+        (tmp_path / f"shard-{index}" / branch / "spark.tgz").write_text(branch)
+        write_manifest(
+            str(tmp_path / f"shard-{index}.json"),
+            index,
+            2,
+            {f"refs/heads/{branch}": {"directory": branch}},
+        )
+
+    merge(
+        [str(tmp_path / "shard-0"), str(tmp_path / "shard-1")],
+        str(tmp_path / "output"),
+        [str(tmp_path / "shard-0.json"), str(tmp_path / "shard-1.json")],
+        str(tmp_path / "output.json"),
+    )
+
+    assert sorted(os.listdir(tmp_path / "output")) == [
+        "lp-spark-3.4.1",
+        "lp-spark-3.4.2",
+    ]
+    manifest = read_manifest(str(tmp_path / "output.json"))
+    assert manifest["shard_count"] == 1
+    assert len(manifest["branches"]) == 2
+
+    # a missing shard is detected before anything is copied
+    with pytest.raises(ValueError):
+        merge(
+            [str(tmp_path / "shard-0")],
+            str(tmp_path / "partial"),
+            [str(tmp_path / "shard-0.json")],
+        )
+    assert not os.path.exists(tmp_path / "partial")
+
+
+def test_merge_empty_shard(tmp_path):
+    """This function test the merge of a shard that downloaded nothing."""
+    os.makedirs(tmp_path / "shard-0" / "lp-spark-3.4.1")
+    write_manifest(
+        str(tmp_path / "shard-0.json"),
+        0,
+        2,
+        {"refs/heads/lp-spark-3.4.1": {"directory": "lp-spark-3.4.1"}},
+    )
+    write_manifest(str(tmp_path / "shard-1.json"), 1, 2, {})
+
+    merge(
+        [str(tmp_path / "shard-0"), str(tmp_path / "shard-1")],
+        str(tmp_path / "output"),
+        [str(tmp_path / "shard-0.json"), str(tmp_path / "shard-1.json")],
+        str(tmp_path / "output.json"),
+    )
+
+    assert os.listdir(tmp_path / "output") == ["lp-spark-3.4.1"]
+    assert len(read_manifest(str(tmp_path / "output.json"))["branches"]) == 1
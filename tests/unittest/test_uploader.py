@@ -6,6 +6,7 @@ from unittest.mock import patch
 
 from uploader.utils import (
     check_next_release_name,
+    clear_tags_cache,
     get_patch_version,
     get_repositories_tags,
     get_version_from_tarball_name,
@@ -108,3 +109,23 @@ def test_get_patch_version():
 
     for idx, release_name in enumerate(release_names):
         assert get_patch_version(release_name) == patches[idx]
+
+
+def test_repositories_tags_cache():
+    """This function test that repository tags are cached until they expire."""
+    clear_tags_cache()
+    with patch(
+        "uploader.utils._fetch_repositories_tags",
+        return_value=("spark-3.4.1-bin-ubuntu0",),
+    ) as fetch:
+        get_repositories_tags("test-owner", "test-project")
+        assert get_repositories_tags("test-owner", "test-project") == [
+            "spark-3.4.1-bin-ubuntu0"
+        ]
+        assert fetch.call_count == 1
+
+        # tags older than the TTL are fetched again
+        with patch("uploader.utils.TAGS_CACHE_TTL", 0):
+            get_repositories_tags("test-owner", "test-project")
+        assert fetch.call_count == 2
+    clear_tags_cache()
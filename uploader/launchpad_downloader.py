@@ -2,20 +2,34 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+from __future__ import annotations
 
 import argparse
-import collections
+import json
 import logging
 import os
-import urllib.request
+import queue
+import threading
+import time
 from argparse import Namespace
 from dataclasses import dataclass
-from typing import Any, Dict, List
-from urllib.error import URLError
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 from urllib.parse import unquote
 
-import httplib2
-from launchpadlib.launchpad import Launchpad
+from uploader.shards import is_in_shard, validate_shard, write_manifest
+
+if TYPE_CHECKING:
+    from launchpadlib.launchpad import Launchpad
 
 LP_APP = "data-platform-java-build-app"
 LP_SERVER = "production"
@@ -23,6 +37,17 @@ LP_VERSION = "devel"
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# build states of a failed build, the build can still be retried on the same commit
+FAILED_BUILD_STATES = {
+    "Failed to build",
+    "Chroot problem",
+    "Build for superseded Source",
+    "Failed to upload",
+    "Cancelled build",
+}
+
 
 @dataclass
 class CIBuild:
@@ -37,6 +62,8 @@ class CIBuild:
 
 def _get_tokenized_librarian_url(lp: Launchpad, file_url: str) -> str:
     """Use OAuth to get a tokenised URL for private downloads"""
+    import httplib2
+
     # rewrote url
     rewritten_url = file_url.replace("code.launchpad.net/", "api.launchpad.net/devel/")
     logger.debug("Rewrote {} to {} for OAuth access...".format(file_url, rewritten_url))
@@ -77,11 +104,73 @@ def parse_args() -> Namespace:
         required=True,
         help="The output folder where the built software will be downloaded.",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=0,
+        help="The index of the shard of branches processed by this run.",
+    )
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=1,
+        help="The number of shards the branches are partitioned into.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="The path of the file where the manifest of the downloaded builds is written.",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=2,
+        help="The number of resolved builds buffered ahead of the downloads.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Poll the branches and download only the builds that were not processed yet.",
+    )
+    parser.add_argument(
+        "--state-file",
+        type=str,
+        default=None,
+        help="The path of the file where the builds processed in watch mode are stored.",
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=60,
+        help="The minimum number of seconds between two polls in watch mode.",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=900,
+        help="The maximum number of seconds between two polls in watch mode.",
+    )
+    parser.add_argument(
+        "--max-polls",
+        type=int,
+        default=0,
+        help="The number of polls after which watch mode stops, 0 to never stop.",
+    )
+    args = parser.parse_args()
+    try:
+        validate_shard(args.shard_index, args.shard_count)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.prefetch < 1:
+        parser.error(f"The prefetch must be positive: {args.prefetch}")
+    return args
 
 
 def get_launchpad(credential_file: str) -> Launchpad:
     """Get launchpad handler."""
+    from launchpadlib.launchpad import Launchpad
+
     return Launchpad.login_with(
         LP_APP,
         LP_SERVER,
@@ -91,70 +180,125 @@ def get_launchpad(credential_file: str) -> Launchpad:
     )
 
 
-def get_branches_in_repo(
-    lp: Launchpad, repo_url: str, branch_prefix: str
-) -> Dict[str, List[Any]]:
-    """Fetch branches from repo."""
+def iter_branches_in_repo(
+    lp: Launchpad,
+    repo_url: str,
+    branch_prefix: str,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> Iterator[Tuple[Any, Any]]:
+    """Iterate over the desired branches of a repo, one page at a time."""
     # get repository
     repo = lp.git_repositories.getByPath(path=repo_url)
 
-    # get all branches
-    branches = list(repo.branches)
-
-    # collect reports for the desired branches
-    branch_map = collections.defaultdict(list)
-    for branch in branches:
+    for branch in repo.branches:
         if branch_prefix and branch_prefix not in branch.path:
             continue
+        if not is_in_shard(branch.path, shard_index, shard_count):
+            continue
+        yield repo, branch
+
+
+def get_latest_build(
+    repo: Any, branch: Any, reports: Optional[List[Any]] = None
+) -> Optional[CIBuild]:
+    """Fetch the latest successful build run of a branch, if any."""
+    logger.info(f"Checking builds for branch: {branch.path}")
+    if reports is None:
+        reports = repo.getStatusReports(commit_sha1=branch.commit_sha1)
+    last_build = None
+    for report in reports:
+        ci_build = report.ci_build
+
+        # only consider successfully built
+        if "Successfully built" not in ci_build.buildstate:
+            continue
 
-        for report in repo.getStatusReports(commit_sha1=branch.commit_sha1):
-            branch_map[branch.path].append(report)
-
-    return branch_map
-
-
-def get_build_runs_by_branch(
-    branches: Dict[str, List[Any]]
-) -> Dict[str, List[CIBuild]]:
-    """Fetch the list of build runs by branch."""
-    branch_builds: Dict[str, List[CIBuild]] = {}
-
-    # iterate over builds
-    for branch, ci_runs in branches.items():
-        logger.info(f"Checking builds for branch: {branch}")
-        if branch not in branch_builds:
-            branch_builds[branch] = []
+        if last_build is None or ci_build.datebuilt > last_build.datebuilt:
+            last_build = ci_build
+
+    if last_build is None:
+        return None
+
+    # only the artifacts of the build to be downloaded are listed
+    return CIBuild(
+        branch.path,
+        last_build.build_log_url,
+        last_build.results,
+        last_build.datebuilt,
+        last_build.commit_sha1,
+        last_build.buildstate,
+        list(last_build.getFileUrls()),
+    )
 
-        for run in ci_runs:
-            ci_build = run.ci_build
 
-            # only consider successfully built
-            if "Successfully built" not in ci_build.buildstate:
+def iter_latest_builds(
+    lp: Launchpad,
+    repo_url: str,
+    branch_prefix: str,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> Iterator[Tuple[str, Optional[CIBuild]]]:
+    """Iterate over each desired branch and its latest successful build, if any."""
+    for repo, branch in iter_branches_in_repo(
+        lp, repo_url, branch_prefix, shard_index, shard_count
+    ):
+        yield branch.path, get_latest_build(repo, branch)
+
+
+def prefetch(items: Iterator[T], maxsize: int = 1) -> Iterator[T]:
+    """Iterate over items produced ahead by a background thread.
+
+    At most maxsize items are buffered, so the producer runs concurrently
+    with the consumer without holding the whole sequence in memory.
+    """
+    if maxsize < 1:
+        raise ValueError(f"The prefetch buffer size must be positive: {maxsize}")
+    buffer: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
                 continue
+        return False
 
-            artifact_urls = []
-            for file_url in run.ci_build.getFileUrls():
-                artifact_urls.append(file_url)
-
-            branch_builds[branch].append(
-                CIBuild(
-                    branch,
-                    ci_build.build_log_url,
-                    ci_build.results,
-                    ci_build.datebuilt,
-                    ci_build.commit_sha1,
-                    ci_build.buildstate,
-                    artifact_urls,
-                )
-            )
-
-    return branch_builds
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:
+            errors.append(e)
+        put(done)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        thread.join()
 
 
 def download_build_artifacts_by_branch(
     launchpad: Launchpad, branch: str, build_run, output_folder: str
 ) -> None:
     """Download build artifacts of a build run."""
+    import urllib.request
+    from urllib.error import URLError
+
     output_directory = f"{output_folder}/{str(branch).split('/')[-1]}"
     os.makedirs(output_directory, exist_ok=True)
 
@@ -168,32 +312,217 @@ def download_build_artifacts_by_branch(
             raise RuntimeError("Failed to download '{}'. '{}'".format(url, e.reason))
 
 
+def get_manifest_entry(build_run: CIBuild) -> Dict[str, Any]:
+    """Describe a downloaded build run for the manifest."""
+    return {
+        "directory": str(build_run.branch_name).split("/")[-1],
+        "commit_sha1": build_run.commit_sha1,
+        "date_built": str(build_run.date_built),
+        "files": [unquote(str(url).split("/")[-1]) for url in build_run.artifact_urls],
+    }
+
+
+def read_watch_state(state_file: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Read the builds processed by previous polls."""
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    with open(state_file) as f:
+        return json.load(f)
+
+
+def write_watch_state(
+    state_file: Optional[str], state: Dict[str, Dict[str, Any]]
+) -> None:
+    """Store the processed builds, replacing the previous state atomically."""
+    if not state_file:
+        return
+    with open(f"{state_file}.tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(f"{state_file}.tmp", state_file)
+
+
+def poll_new_builds(
+    lp: Launchpad,
+    repo_url: str,
+    branch_prefix: str,
+    state: Dict[str, Dict[str, Any]],
+    shard_index: int = 0,
+    shard_count: int = 1,
+    recheck_failed_after: float = 0,
+    now: float = 0,
+) -> Iterator[Tuple[str, str, Optional[CIBuild]]]:
+    """Iterate over the branch heads not processed yet whose builds are done.
+
+    Each head is yielded with its latest successful build, or None when all
+    its builds failed. Heads with builds still pending are checked again on
+    the next poll. Heads whose builds failed are checked again once
+    recheck_failed_after seconds have passed since their last check, in case
+    a build was retried.
+    """
+    for repo, branch in iter_branches_in_repo(
+        lp, repo_url, branch_prefix, shard_index, shard_count
+    ):
+        # the status reports are only fetched when the head has moved
+        processed = state.get(branch.path)
+        if processed and processed["commit_sha1"] == branch.commit_sha1:
+            if processed.get("status") != "failed":
+                continue
+            if now - processed.get("checked_at", 0) < recheck_failed_after:
+                continue
+
+        reports = list(repo.getStatusReports(commit_sha1=branch.commit_sha1))
+        build_run = get_latest_build(repo, branch, reports)
+        if build_run is None and not (
+            reports
+            and all(r.ci_build.buildstate in FAILED_BUILD_STATES for r in reports)
+        ):
+            continue
+        yield branch.path, branch.commit_sha1, build_run
+
+
+def watch(
+    lp: Launchpad,
+    repo_url: str,
+    branch_prefix: str,
+    download: Callable[[CIBuild], None],
+    emit: Callable[[Dict[str, Any]], None],
+    state_file: Optional[str] = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    min_interval: float = 60,
+    max_interval: float = 900,
+    max_polls: int = 0,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.time,
+) -> None:
+    """Poll the branches and process only the new successful builds.
+
+    The interval between polls doubles each time nothing new is found, up to
+    max_interval, and goes back to min_interval as soon as a new build shows up.
+    Heads whose builds failed are checked again every max_interval seconds.
+    A failed poll is logged and retried after max_interval, keeping the state.
+    """
+    state = read_watch_state(state_file)
+    interval = min_interval
+    polls = 0
+    while True:
+        new_builds = 0
+        error: Optional[Exception] = None
+        try:
+            now = clock()
+            for branch, commit_sha1, build_run in poll_new_builds(
+                lp,
+                repo_url,
+                branch_prefix,
+                state,
+                shard_index,
+                shard_count,
+                max_interval,
+                now,
+            ):
+                if build_run is None:
+                    logger.info(f"All builds failed for branch: {branch}")
+                    state[branch] = {
+                        "commit_sha1": commit_sha1,
+                        "status": "failed",
+                        "checked_at": now,
+                    }
+                    write_watch_state(state_file, state)
+                    continue
+
+                logger.info(f"New build for branch: {branch}")
+                download(build_run)
+                state[branch] = {
+                    "commit_sha1": commit_sha1,
+                    "date_built": str(build_run.date_built),
+                    "status": "built",
+                }
+                write_watch_state(state_file, state)
+                emit({"branch": build_run.branch_name, **get_manifest_entry(build_run)})
+                new_builds += 1
+
+        except Exception as e:
+            # a transient Launchpad or download error must not end the watcher,
+            # the state of the builds processed so far is already stored
+            logger.exception("Failed to poll the branches")
+            error = e
+
+        polls += 1
+        if max_polls and polls >= max_polls:
+            if error is not None:
+                raise error
+            return
+
+        if error is not None:
+            interval = max_interval
+        else:
+            interval = min_interval if new_builds else min(interval * 2, max_interval)
+        logger.info(f"Found {new_builds} new builds, next poll in {interval}s")
+        sleep(interval)
+
+
 def main():
     """Download latest build software from Launchpad repository."""
     args = parse_args()
 
+    # the output folder exists even when there is nothing to download
+    os.makedirs(args.output_folder, exist_ok=True)
+
     # Get Launchpad instance
     launchpad = get_launchpad(args.credential_file)
 
-    # fetch repositories
-    branches = get_branches_in_repo(launchpad, args.repository_url, args.branch_prefix)
-    if not branches:
-        raise ValueError(
-            "No items to download please checks the repository or branch prefix"
+    if args.watch:
+        # each new build is printed as a JSON line for the release stage
+        watch(
+            launchpad,
+            args.repository_url,
+            args.branch_prefix,
+            lambda build_run: download_build_artifacts_by_branch(
+                launchpad, build_run.branch_name, build_run, args.output_folder
+            ),
+            lambda candidate: print(json.dumps(candidate), flush=True),
+            args.state_file,
+            args.shard_index,
+            args.shard_count,
+            args.min_interval,
+            args.max_interval,
+            args.max_polls,
         )
+        return
+
+    # branches are discovered by a separate client in a background thread,
+    # each latest build is downloaded as soon as it is resolved
+    builds = prefetch(
+        iter_latest_builds(
+            get_launchpad(args.credential_file),
+            args.repository_url,
+            args.branch_prefix,
+            args.shard_index,
+            args.shard_count,
+        ),
+        maxsize=args.prefetch,
+    )
 
-    # fetch list of builds by branch
-    branch_builds = get_build_runs_by_branch(branches)
-
-    # iterate over each branch and download locally the latest build
-    for branch, runs in branch_builds.items():
-        if not runs:
+    matched_branches = 0
+    downloaded: Dict[str, Dict[str, Any]] = {}
+    for branch, build_run in builds:
+        matched_branches += 1
+        if build_run is None:
             continue
-
-        last_run = sorted(runs, key=lambda x: x.date_built, reverse=True)[0]
         download_build_artifacts_by_branch(
-            launchpad, branch, last_run, args.output_folder
+            launchpad, branch, build_run, args.output_folder
         )
+        downloaded[branch] = get_manifest_entry(build_run)
+
+    if not matched_branches:
+        if args.shard_count == 1:
+            raise ValueError(
+                "No items to download please checks the repository or branch prefix"
+            )
+        logger.warning(f"No items to download in shard {args.shard_index}")
+
+    if args.manifest:
+        write_manifest(args.manifest, args.shard_index, args.shard_count, downloaded)
 
 
 if __name__ == "__main__":
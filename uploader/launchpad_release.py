@@ -2,19 +2,33 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+from __future__ import annotations
+
+import json
 import logging
+import threading
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
 
-from launchpadlib.errors import HTTPError
-from launchpadlib.launchpad import Launchpad
-from lazr.restfulclient.resource import Entry
+if TYPE_CHECKING:
+    from launchpadlib.launchpad import Launchpad
+    from lazr.restfulclient.resource import Entry
 
 logger = logging.getLogger(__name__)
 LP_SERVER = "production"
 
 
+@dataclass
+class ReleaseEntry:
+    track: str
+    version: str
+    tarball: str
+
+
 def parse_args() -> Namespace:
     """Parse command line args."""
     parser = ArgumentParser()
@@ -30,9 +44,37 @@ def parse_args() -> Namespace:
         "--credentials",
         help="Credentials file to authenticate the Launchpad client.",
     )
+    parser.add_argument(
+        "-b",
+        "--batch",
+        help="JSON file with a list of track, version and tarball entries to release.",
+    )
+    parser.add_argument(
+        "-j",
+        "--max-workers",
+        type=int,
+        default=4,
+        help="Maximum number of concurrent uploads in batch mode.",
+    )
     return parser.parse_args()
 
 
+def read_batch(batch_file: str) -> List[ReleaseEntry]:
+    """Read the entries to be released from a JSON file."""
+    with open(batch_file) as f:
+        return [
+            ReleaseEntry(str(item["track"]), str(item["version"]), item["tarball"])
+            for item in json.load(f)
+        ]
+
+
+def get_launchpad(project: str, credentials: str) -> Launchpad:
+    """Get launchpad handler."""
+    from launchpadlib.launchpad import Launchpad
+
+    return Launchpad.login_with(project, LP_SERVER, credentials_file=credentials)
+
+
 def get_series(lp_project: Entry, track: str, app: str):
     """Fetch the series matching the current version."""
     series = lp_project.getSeries(name=track)
@@ -43,11 +85,22 @@ def get_series(lp_project: Entry, track: str, app: str):
     )
 
 
-def get_milestone(lp_project: Entry, lp_series: Entry, version: str):
-    """Fetch the milestone matching this version or create one if not exists."""
-    milestones = [milestone.name for milestone in lp_series.all_milestones]
+def get_milestone(
+    lp_project: Entry,
+    lp_series: Entry,
+    version: str,
+    milestones: Optional[Set[str]] = None,
+):
+    """Fetch the milestone matching this version or create one if not exists.
+
+    The names of the milestones of the series are fetched unless given, and
+    the created milestone is added to them.
+    """
+    if milestones is None:
+        milestones = {milestone.name for milestone in lp_series.all_milestones}
     if version in milestones:
         return lp_project.getMilestone(name=version)
+    milestones.add(version)
     return lp_series.newMilestone(name=version)
 
 
@@ -57,10 +110,19 @@ def get_release(
     lp_milestone: Entry,
     tarball_path: str,
     version: str,
+    releases: Optional[Set[str]] = None,
 ):
-    """Get release or create one if not exists."""
-    releases = [release.version for release in lp_series.releases]
+    """Get release or create one if not exists.
+
+    The versions of the releases of the series are fetched unless given, and
+    the created release is added to them.
+    """
+    from launchpadlib.errors import HTTPError
+
+    if releases is None:
+        releases = {release.version for release in lp_series.releases}
     if version not in releases:
+        releases.add(version)
         return lp_milestone.createProductRelease(
             date_released=datetime.now().isoformat(),
             release_notes=f"Release {version}.",
@@ -81,6 +143,41 @@ def get_release(
     return release
 
 
+class ProjectReleases:
+    """View of the series, milestones and releases of a project, fetched once."""
+
+    def __init__(self, lp_project: Entry, app: str):
+        self.lp_project = lp_project
+        self.app = app
+        self._series: Dict[str, Entry] = {}
+        self._milestones: Dict[str, Set[str]] = {}
+        self._releases: Dict[str, Set[str]] = {}
+
+    def get_series(self, track: str) -> Entry:
+        """Fetch the series of a track or create one if not exists."""
+        if track not in self._series:
+            lp_series = get_series(self.lp_project, track, self.app)
+            self._series[track] = lp_series
+            self._milestones[track] = {m.name for m in lp_series.all_milestones}
+            self._releases[track] = {r.version for r in lp_series.releases}
+        return self._series[track]
+
+    def get_release(self, entry: ReleaseEntry) -> Entry:
+        """Get release or create one if not exists."""
+        lp_series = self.get_series(entry.track)
+        lp_milestone = get_milestone(
+            self.lp_project, lp_series, entry.version, self._milestones[entry.track]
+        )
+        return get_release(
+            self.lp_project,
+            lp_series,
+            lp_milestone,
+            entry.tarball,
+            entry.version,
+            self._releases[entry.track],
+        )
+
+
 def upload_release_files(
     release, app: str, tarball_file_path: str, track: str, version: str
 ):
@@ -102,14 +199,57 @@ def upload_release_files(
     release.add_file(**payload)
 
 
+def release_entries(
+    lp_project: Entry,
+    app: str,
+    entries: List[ReleaseEntry],
+    project: str,
+    credentials: str,
+    max_workers: int,
+) -> None:
+    """Create the releases of all the entries and upload their files concurrently."""
+    # series, milestones and releases are created sequentially on a single view
+    project_releases = ProjectReleases(lp_project, app)
+    releases: List[Tuple[ReleaseEntry, Entry]] = [
+        (entry, project_releases.get_release(entry)) for entry in entries
+    ]
+
+    if max_workers <= 1 or len(releases) <= 1:
+        for entry, release in releases:
+            upload_release_files(
+                release, app, entry.tarball, entry.track, entry.version
+            )
+        return
+
+    # launchpadlib clients are not thread safe, each worker logs in once
+    local = threading.local()
+
+    def upload(entry: ReleaseEntry, release: Entry) -> None:
+        if not hasattr(local, "launchpad"):
+            local.launchpad = get_launchpad(project, credentials)
+        worker_release = local.launchpad.load(str(release.self_link))
+        logger.info(f"Uploading {entry.tarball} to release {entry.version}")
+        upload_release_files(
+            worker_release, app, entry.tarball, entry.track, entry.version
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(upload, entry, release) for entry, release in releases
+        ]
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    for error in errors:
+        logger.error(f"Failed to upload release files: {error}")
+    if errors:
+        raise errors[0]  # type: ignore[misc]
+
+
 def main():
     """Download and store latest release artifacts for the release branches of a product."""
     args = parse_args()
 
     # get launchpad client
-    launchpad = Launchpad.login_with(
-        args.project, LP_SERVER, credentials_file=args.credentials
-    )
+    launchpad = get_launchpad(args.project, args.credentials)
 
     lp_project = launchpad.projects[args.project]
 
@@ -118,20 +258,22 @@ def main():
         exit(0)
     # check if project is private stop HERE
 
-    # fetch project series matching with version
-    lp_series = get_series(lp_project, args.track, args.app)
+    if args.batch:
+        entries = read_batch(args.batch)
+    else:
+        entries = [ReleaseEntry(args.track, args.version, args.tarball)]
 
-    # get milestone or create if not exists
-    lp_milestone = get_milestone(lp_project, lp_series, args.version)
-
-    # get release or create if not exists
-    lp_release = get_release(
-        lp_project, lp_series, lp_milestone, args.tarball, args.version
+    # get or create series, milestones and releases and upload the tarball
+    # and signature file if any
+    release_entries(
+        lp_project,
+        args.app,
+        entries,
+        args.project,
+        args.credentials,
+        args.max_workers,
     )
 
-    # upload the tarball and signature file if any
-    upload_release_files(lp_release, args.app, args.tarball, args.track, args.version)
-
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,50 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import re
+
+PRODUCT_PATTERN = "^[a-z]*-\\d[.]\\d[.]\\d-.*-ubuntu(0|[1-9][0-9]*)-(20\\d{2})[01][1-9][0-3][1-9][0-1]\\d[0-5]\\d[0-5]\\d\\S*"
+TAG_PATTERN = "-(20\\d{2})[01][1-9][0-3][1-9][0-1]\\d[0-5]\\d[0-5]\\d\\S*"
+RELEASE_VERSION = "^[a-z]*-\\d[.]\\d[.]\\d-.*-ubuntu(0|[1-9][0-9]*)"
+
+PRODUCT_RE = re.compile(PRODUCT_PATTERN)
+TAG_RE = re.compile(TAG_PATTERN)
+RELEASE_VERSION_RE = re.compile(RELEASE_VERSION)
+
+
+def is_valid_release_version(release_version: str) -> bool:
+    """This function validates the release version."""
+    try:
+        if RELEASE_VERSION_RE.match(release_version):
+            return True
+    except Exception:
+        raise ValueError("Name do not match the ")
+    return False
+
+
+def is_valid_product_name(product_name: str) -> bool:
+    """This function validates the name of the tarball."""
+    try:
+        if PRODUCT_RE.match(product_name):
+            return True
+    except Exception:
+        raise ValueError("Name do not match the ")
+    return False
+
+
+def get_patch_version(release_version: str) -> int:
+    """Return the patch version from the release version."""
+    if not is_valid_release_version(release_version):
+        raise ValueError(f"The release version '{release_version}' is not valid!")
+    return int(release_version.split("-")[-1].replace("ubuntu", ""))
+
+
+def get_version_from_tarball_name(tarball_name: str) -> str:
+    """This function extract the the tag name that will used for the release."""
+    assert is_valid_product_name(tarball_name)
+
+    try:
+        items = TAG_RE.split(tarball_name)
+        return items[0]
+    except Exception:
+        raise ValueError("ERROR")
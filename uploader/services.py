@@ -1,16 +1,15 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+import contextlib
+import json
 import logging
+import sys
 from argparse import ArgumentParser, Namespace
 from enum import Enum
+from typing import Any, Dict, Optional, TextIO
 
-from uploader.utils import (
-    check_new_releases,
-    get_version_from_tarball_name,
-    is_valid_product_name,
-    upload_jars,
-)
+from uploader.naming import get_version_from_tarball_name, is_valid_product_name
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +19,7 @@ class Actions(str, Enum):
     VALID_NAME = "validate-name"
     CHECK_VERSION = "check-releases"
     UPLOAD = "upload-product-jars"
+    SERVE = "serve"
 
 
 def create_services_parser(parser: ArgumentParser) -> ArgumentParser:
@@ -94,21 +94,36 @@ def create_services_parser(parser: ArgumentParser) -> ArgumentParser:
         help="Artifactory password.",
         required=True,
     )
+    parser_upload.add_argument(
+        "-b",
+        "--bulk",
+        action="store_true",
+        help="Deploy all the files in a single archive exploded by Artifactory.",
+    )
+
+    subparser.add_parser(
+        Actions.SERVE.value,
+        help="Process JSON-lines action requests from stdin until EOF.",
+    )
 
     return parser
 
 
-def main(args: Namespace):
+def run_action(args: Namespace) -> Optional[str]:
+    """Run a single action and return its output, if any."""
     if args.action == Actions.VERSION:
         if not is_valid_product_name(args.name):
             raise ValueError("Invalid product name!")
-        print(get_version_from_tarball_name(args.name))
+        return get_version_from_tarball_name(args.name)
 
     elif args.action == Actions.VALID_NAME:
         if not is_valid_product_name(args.name):
             raise ValueError("Invalid product name!")
 
     elif args.action == Actions.CHECK_VERSION:
+        # network and archive dependencies are only loaded by the actions using them
+        from uploader.utils import check_new_releases
+
         check_new_releases(
             args.output_directory,
             args.tarball_pattern,
@@ -116,15 +131,81 @@ def main(args: Namespace):
             args.project_name,
         )
     elif args.action == Actions.UPLOAD:
+        from uploader.utils import upload_jars
+
         upload_jars(
             args.tarball_path,
             args.mvn_repository,
             args.artifactory_url,
             args.artifactory_username,
             args.artifactory_password,
+            args.bulk,
         )
     else:
         raise ValueError(f"Option: {args.action} is not a valid option!")
+    return None
+
+
+def parse_request(parser: ArgumentParser, request: Dict[str, Any]) -> Namespace:
+    """Parse a JSON action request with the command line parser."""
+    argv = [str(request.pop("action", ""))]
+    for key, value in request.items():
+        option = f"--{key.replace('_', '-')}"
+        if value is True:
+            argv.append(option)
+        elif value is not False and value is not None:
+            argv.extend([option, str(value)])
+    try:
+        # help and usage messages must not end up in the JSON-lines responses
+        with contextlib.redirect_stdout(sys.stderr):
+            return parser.parse_args(argv)
+    except SystemExit:
+        # argparse has already reported the error on stderr
+        raise ValueError(f"Invalid request arguments: {argv}")
+
+
+def serve(input_stream: TextIO, output_stream: TextIO) -> None:
+    """Process one JSON action request per line and write one JSON result per line.
+
+    Each request is an object with an "action" key and the arguments of that
+    action keyed by their long option name with underscores, e.g.
+    {"action": "get-version", "name": "spark-3.4.1-bin-ubuntu0-20230821132449.tgz"}.
+    Requests are validated by the same parser as the command line. An optional
+    "id" is echoed back in the response.
+    """
+    parser = create_services_parser(
+        ArgumentParser(description="Services for the Github Central Uploader")
+    )
+    for line in input_stream:
+        if not line.strip():
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.pop("id", None)
+            if request.get("action") == Actions.SERVE:
+                raise ValueError("Option: serve cannot be nested!")
+            result = run_action(parse_request(parser, request))
+            response = {"id": request_id, "status": "ok", "result": result}
+        except Exception as e:
+            logger.exception("Failed to process request")
+            response = {
+                "id": request_id,
+                "status": "error",
+                "error": f"{type(e).__name__}: {e}",
+            }
+        output_stream.write(json.dumps(response) + "\n")
+        output_stream.flush()
+
+
+def main(args: Namespace):
+    if args.action == Actions.SERVE:
+        serve(sys.stdin, sys.stdout)
+        return
+
+    result = run_action(args)
+    if result is not None:
+        print(result)
 
 
 if __name__ == "__main__":
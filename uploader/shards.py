@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+from argparse import Namespace
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def get_shard(branch: str, shard_count: int) -> int:
+    """Return the shard of a branch, stable across processes and runners."""
+    digest = hashlib.sha256(branch.encode("utf-8")).hexdigest()
+    return int(digest, 16) % shard_count
+
+
+def is_in_shard(branch: str, shard_index: int, shard_count: int) -> bool:
+    """Check whether a branch belongs to the given shard."""
+    return get_shard(branch, shard_count) == shard_index
+
+
+def validate_shard(shard_index: int, shard_count: int) -> None:
+    """Validate the shard index and count."""
+    if shard_count < 1:
+        raise ValueError(f"The shard count must be positive: {shard_count}")
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(
+            f"The shard index must be in [0, {shard_count}): {shard_index}"
+        )
+
+
+def write_manifest(
+    manifest_path: str,
+    shard_index: int,
+    shard_count: int,
+    branches: Dict[str, Dict[str, Any]],
+) -> None:
+    """Write the manifest of the branches downloaded by a shard."""
+    manifest = {
+        "shard_index": shard_index,
+        "shard_count": shard_count,
+        "branches": branches,
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def read_manifest(manifest_path: str) -> Dict[str, Any]:
+    """Read the manifest written by a shard."""
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def merge_manifests(manifests: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Combine the branches of the manifests of all the shards of a run."""
+    if not manifests:
+        return {}
+
+    shard_counts = {manifest["shard_count"] for manifest in manifests}
+    if len(shard_counts) != 1:
+        raise ValueError(f"Manifests have different shard counts: {shard_counts}")
+    shard_count = shard_counts.pop()
+
+    shard_indexes = sorted(manifest["shard_index"] for manifest in manifests)
+    if shard_indexes != list(range(shard_count)):
+        raise ValueError(
+            f"Expected one manifest for each of the {shard_count} shards, got: {shard_indexes}"
+        )
+
+    branches: Dict[str, Dict[str, Any]] = {}
+    for manifest in manifests:
+        for branch, build in manifest["branches"].items():
+            if branch in branches:
+                raise ValueError(f"Branch {branch} was downloaded by multiple shards")
+            branches[branch] = build
+
+    return branches
+
+
+def merge_shard_folders(shard_folders: List[str], output_folder: str) -> None:
+    """Copy the release directories of every shard into the output folder."""
+    os.makedirs(output_folder, exist_ok=True)
+    for shard_folder in shard_folders:
+        # a shard without builds to download may not have created its folder
+        if not os.path.isdir(shard_folder):
+            logger.warning(f"Shard folder {shard_folder} not found, skipping it")
+            continue
+        for release_directory in sorted(os.listdir(shard_folder)):
+            source = f"{shard_folder}/{release_directory}"
+            destination = f"{output_folder}/{release_directory}"
+            if os.path.exists(destination):
+                raise ValueError(
+                    f"Release directory {release_directory} is present in multiple shards"
+                )
+            logger.info(f"Copying {source} to {destination}")
+            shutil.copytree(source, destination)
+
+
+def parse_args() -> Namespace:
+    """Parse command line args"""
+    parser = argparse.ArgumentParser(
+        description="Merge the output of the sharded Launchpad downloader."
+    )
+    parser.add_argument(
+        "--shard-folder",
+        type=str,
+        action="append",
+        required=True,
+        help="The output folder of a shard, repeat for each shard.",
+    )
+    parser.add_argument(
+        "--shard-manifest",
+        type=str,
+        action="append",
+        default=[],
+        help="The manifest file of a shard, repeat for each shard.",
+    )
+    parser.add_argument(
+        "--output-folder",
+        type=str,
+        required=True,
+        help="The folder where the downloads of all the shards are merged.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="The path of the merged manifest file.",
+    )
+    return parser.parse_args()
+
+
+def merge(
+    shard_folders: List[str],
+    output_folder: str,
+    shard_manifests: Optional[List[str]] = None,
+    manifest_path: Optional[str] = None,
+) -> None:
+    """Merge the folders and manifests of the shards of a run."""
+    # validate the manifests before touching the output folder
+    branches = merge_manifests([read_manifest(m) for m in shard_manifests or []])
+    merge_shard_folders(shard_folders, output_folder)
+    if manifest_path:
+        write_manifest(manifest_path, 0, 1, branches)
+
+
+def main():
+    """Merge the output of the sharded Launchpad downloader."""
+    args = parse_args()
+    merge(args.shard_folder, args.output_folder, args.shard_manifest, args.manifest)
+
+
+if __name__ == "__main__":
+    main()
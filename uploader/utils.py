@@ -2,25 +2,49 @@
 # See LICENSE file for licensing details.
 
 import fnmatch
+import functools
 import logging
 import os
-import re
+import posixpath
 import shutil
 import tarfile
+import tempfile
+import time
 import zipfile
-from typing import List
+from typing import IO, Dict, List, Tuple
 
 import requests
 from requests.auth import HTTPBasicAuth
 
-logger = logging.getLogger(__name__)
+# the name helpers live in uploader.naming and are re-exported for existing callers
+from uploader.naming import (  # noqa: F401
+    PRODUCT_PATTERN,
+    RELEASE_VERSION,
+    TAG_PATTERN,
+    get_patch_version,
+    get_version_from_tarball_name,
+    is_valid_product_name,
+    is_valid_release_version,
+)
 
-PRODUCT_PATTERN = "^[a-z]*-\\d[.]\\d[.]\\d-.*-ubuntu(0|[1-9][0-9]*)-(20\\d{2})[01][1-9][0-3][1-9][0-1]\\d[0-5]\\d[0-5]\\d\\S*"
-TAG_PATTERN = "-(20\\d{2})[01][1-9][0-3][1-9][0-1]\\d[0-5]\\d[0-5]\\d\\S*"
-RELEASE_VERSION = "^[a-z]*-\\d[.]\\d[.]\\d-.*-ubuntu(0|[1-9][0-9]*)"
+logger = logging.getLogger(__name__)
 
 CUSTOM_KEYMAP = [".jar", ".pom", ".sha1", ".sha256", ".sha512"]
 
+MAVEN_REPOSITORY_FOLDER = "repository/"
+DEPLOY_ARCHIVE_NAME = "deploy-bundle.zip"
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# seconds after which the tags of a repository are fetched again
+TAGS_CACHE_TTL = 60
+_TAGS_CACHE: Dict[Tuple[str, str], Tuple[float, Tuple[str, ...]]] = {}
+
+
+@functools.lru_cache(maxsize=None)
+def get_session() -> requests.Session:
+    """Return the HTTP session shared by all the requests of this process."""
+    return requests.Session()
+
 
 def file_comparator(file: str):
     """Comparator for ordering file extensions for upload."""
@@ -29,28 +53,6 @@ def file_comparator(file: str):
     return 100
 
 
-def is_valid_release_version(release_version: str) -> bool:
-    """This function validates the release version."""
-    try:
-        p = re.compile(RELEASE_VERSION)
-        if p.match(release_version):
-            return True
-    except Exception:
-        raise ValueError("Name do not match the ")
-    return False
-
-
-def is_valid_product_name(product_name: str) -> bool:
-    """This function validates the name of the tarball."""
-    try:
-        p = re.compile(PRODUCT_PATTERN)
-        if p.match(product_name):
-            return True
-    except Exception:
-        raise ValueError("Name do not match the ")
-    return False
-
-
 def get_product_tags(
     repository_owner: str, project_name: str, product_name: str, product_version: str
 ):
@@ -106,13 +108,6 @@ def check_new_releases(
         shutil.rmtree(f"{output_directory}/{folder}")
 
 
-def get_patch_version(release_version: str) -> int:
-    """Return the patch version from the release version."""
-    if not is_valid_release_version(release_version):
-        raise ValueError(f"The release version '{release_version}' is not valid!")
-    return int(release_version.split("-")[-1].replace("ubuntu", ""))
-
-
 def check_next_release_name(
     repository_owner: str,
     project_name: str,
@@ -144,82 +139,157 @@ def check_next_release_name(
 
 def get_jars_in_tarball(tarball_path: str) -> List[str]:
     """Return all the jars contained into a tarball."""
-    os.mkdir("tmp")
-
     with tarfile.open(tarball_path) as file:
-        file.extractall("tmp/")
-
         jar_filenames = [
-            filename
-            for _, _, files in os.walk("tmp/")
-            for filename in files
-            if filename.endswith(".jar")
+            os.path.basename(member.name)
+            for member in file.getmembers()
+            if member.isfile() and member.name.endswith(".jar")
         ]
 
     logger.info(f"Number of jars: {len(jar_filenames)}")
-    shutil.rmtree("tmp")
     return jar_filenames
 
 
+def get_maven_files_to_upload(
+    maven_repository: zipfile.ZipFile, jars_to_upload: List[str]
+) -> List[str]:
+    """Return the archive entries of the Maven directories containing the given jars."""
+    subdirs: Dict[str, List[str]] = {}
+    for name in maven_repository.namelist():
+        if not name.startswith(MAVEN_REPOSITORY_FOLDER) or name.endswith("/"):
+            continue
+        subdir, file = posixpath.split(name)
+        subdirs.setdefault(subdir, []).append(file)
+
+    entries = []
+    for subdir, files in subdirs.items():
+        if not any(file.endswith(".jar") and file in jars_to_upload for file in files):
+            continue
+        logger.info(f"subdir: {subdir}")
+        for file in sorted(files, key=file_comparator):
+            # skip temp files or metadata
+            if file.startswith("_") or file.endswith(".repositories"):
+                continue
+            entries.append(f"{subdir}/{file}")
+    return entries
+
+
+def build_deploy_archive(
+    maven_repository: zipfile.ZipFile, entries: List[str], archive: IO[bytes]
+) -> None:
+    """Copy the entries of the Maven repository into a zip rooted at the repository folder.
+
+    Entries are stored uncompressed: jars are already compressed, so the bundle
+    is a plain copy of the source data.
+    """
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as bundle:
+        for entry in entries:
+            with maven_repository.open(entry) as src, bundle.open(
+                entry[len(MAVEN_REPOSITORY_FOLDER) :], "w"
+            ) as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+
+def deploy_archive(
+    maven_repository: zipfile.ZipFile,
+    entries: List[str],
+    artifactory_repository: str,
+    auth: HTTPBasicAuth,
+) -> bool:
+    """Deploy the entries in a single request using the Artifactory explode-archive deploy.
+
+    The bundle is spooled to a temporary file because its central directory is
+    only written once all entries are copied, and requests needs a sized file to
+    send a Content-Length header instead of a chunked upload.
+    """
+    with tempfile.TemporaryFile() as archive:
+        build_deploy_archive(maven_repository, entries, archive)
+        archive.seek(0)
+        url = f"{artifactory_repository}{DEPLOY_ARCHIVE_NAME}"
+        logger.info(f"Deploying {len(entries)} files to {url}")
+        headers = {
+            "Content-Type": "application/zip",
+            "X-Explode-Archive-Atomic": "true",
+        }
+        try:
+            r = get_session().put(url, headers=headers, data=archive, auth=auth)
+        except requests.RequestException as e:
+            logger.warning(f"Archive deploy failed: {e}")
+            return False
+
+    if r.status_code not in (200, 201):
+        logger.warning(f"Archive deploy failed with status code: {r.status_code}")
+        return False
+    return True
+
+
+def deploy_files(
+    maven_repository: zipfile.ZipFile,
+    entries: List[str],
+    artifactory_repository: str,
+    auth: HTTPBasicAuth,
+) -> None:
+    """Deploy the entries with one request per file."""
+    for entry in entries:
+        url = f"{artifactory_repository}{entry[len(MAVEN_REPOSITORY_FOLDER):]}"
+        logger.debug(f"upload url: {url}")
+        headers = {"Content-Type": "application/java-application"}
+        with maven_repository.open(entry) as data:
+            r = get_session().put(url, headers=headers, data=data, auth=auth)
+        assert r.status_code == 201
+
+
 def upload_jars(
     tarball_path: str,
     maven_repository_archive: str,
     artifactory_repository: str,
     artifactory_username: str,
     artifactory_password: str,
+    bulk: bool = False,
 ):
-    """Upload jars to artifactory."""
+    """Upload jars to artifactory.
+
+    When bulk is set, the files are deployed as a single archive exploded by
+    Artifactory, falling back to one request per file if that fails.
+    """
     jars_to_upload = get_jars_in_tarball(tarball_path)
-    os.mkdir("tmp")
-    with zipfile.ZipFile(maven_repository_archive, "r") as zip:
-        zip.extractall("tmp/")
-
-    subdirs = []
-    folder = "tmp/repository/"
-    for subdir, _, files in os.walk(folder):
-        for file in files:
-            if file.endswith(".jar"):
-                if file in jars_to_upload:
-                    logger.info(f"subdir: {subdir}")
-                    subdirs.append(subdir)
-
-    for subdir in subdirs:
-        files = sorted(os.listdir(subdir), key=file_comparator)
-        for file in files:
-            # skip temp files or metadata
-            if file.startswith("_") or file.endswith(".repositories"):
-                continue
-            url = f"{artifactory_repository}{subdir.replace(folder,'')}/{file}"
-            logger.debug(f"upload url: {url}")
-            headers = {"Content-Type": "application/java-application"}
-            r = requests.put(
-                url,
-                headers=headers,
-                data=open(f"{subdir}/{file}", "rb"),
-                auth=HTTPBasicAuth(artifactory_username, artifactory_password),
-            )
-            assert r.status_code == 201
+    auth = HTTPBasicAuth(artifactory_username, artifactory_password)
+    with zipfile.ZipFile(maven_repository_archive, "r") as maven_repository:
+        entries = get_maven_files_to_upload(maven_repository, jars_to_upload)
+        if not entries:
+            return
+        if bulk and deploy_archive(
+            maven_repository, entries, artifactory_repository, auth
+        ):
+            return
+        deploy_files(maven_repository, entries, artifactory_repository, auth)
 
-    shutil.rmtree("tmp")
 
+def clear_tags_cache() -> None:
+    """Forget the tags fetched so far."""
+    _TAGS_CACHE.clear()
 
-def get_version_from_tarball_name(tarball_name: str) -> str:
-    """This function extract the the tag name that will used for the release."""
-    assert is_valid_product_name(tarball_name)
 
-    try:
-        p = re.compile(TAG_PATTERN)
-        items = p.split(tarball_name)
-        return items[0]
-    except Exception:
-        raise ValueError("ERROR")
+def get_repositories_tags(owner: str, repository_name) -> List[str]:
+    """This function return the list of tags in the database.
 
+    Tags are cached for TAGS_CACHE_TTL seconds, use clear_tags_cache to fetch
+    them again earlier.
+    """
+    cached = _TAGS_CACHE.get((owner, repository_name))
+    if cached is not None and time.monotonic() - cached[0] < TAGS_CACHE_TTL:
+        return list(cached[1])
 
-def get_repositories_tags(owner: str, repository_name) -> List[str]:
-    """This function return the list of tags in the database."""
+    tags = _fetch_repositories_tags(owner, repository_name)
+    _TAGS_CACHE[(owner, repository_name)] = (time.monotonic(), tags)
+    return list(tags)
+
+
+def _fetch_repositories_tags(owner: str, repository_name) -> Tuple[str, ...]:
+    """Fetch the tags of a repository from the Github API."""
     url = f"https://api.github.com/repos/{owner}/{repository_name}/tags"
     logger.debug(f"url: {url}")
-    r = requests.get(url)
+    r = get_session().get(url)
     logger.debug(f"status code: {r.status_code}")
     assert r.status_code == 200
     items = r.json()
@@ -230,4 +300,4 @@ def get_repositories_tags(owner: str, repository_name) -> List[str]:
         else:
             logger.warning(f"No key 'name' in Github API response: {item}")
 
-    return tags
+    return tuple(tags)